@@ -3,39 +3,80 @@ import cv2
 import numpy as np
 import threading
 import time
+import collections
+import functools
+import json
 import datetime
 import platform
-from flask import Flask, render_template, Response, request, jsonify, redirect, url_for, flash
+from flask import Flask, render_template, Response, request, redirect, url_for, flash
 from werkzeug.utils import secure_filename
+from jinja2 import FileSystemBytecodeCache
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from email.mime.image import MIMEImage
 from twilio.rest import Client
 
+try:
+    from numba import njit, prange
+except ImportError:  # Numba is optional; motion detection falls back to OpenCV ops
+    njit = None
+
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
+# Keep compiled templates on disk so restarts skip recompiling them; Jinja's
+# default directory is private to the current user
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+
+# Build the template datetime at most once per second
+@functools.lru_cache(maxsize=1)
+def datetime_for_second(second):
+    return datetime.datetime.fromtimestamp(second)
+
 # Context processor to add current datetime to all templates
 @app.context_processor
 def inject_now():
-    return {'now': datetime.datetime.now()}
+    return {'now': datetime_for_second(int(time.time()))}
 
 # Configuration
 UPLOAD_FOLDER = 'static/captures'
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+SMTP_TIMEOUT = 10  # Seconds before a stalled SMTP server is given up on
+DILATE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (5, 5))  # One pass, same reach as 3x3 twice
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 
 # Ensure directories exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
+# Let OpenCV use its SIMD dispatch and spread work across cores
+cv2.setUseOptimized(True)
+cv2.setNumThreads(max(2, (os.cpu_count() or 2) - 1))
+
+# Pick a detection backend: CUDA if OpenCV was built with it and a GPU is present,
+# otherwise OpenCV's own calls, through OpenCL (via UMat) when a device is available
+use_cuda = hasattr(cv2, 'cuda') and cv2.cuda.getCudaEnabledDeviceCount() > 0
+use_opencl = not use_cuda and cv2.ocl.haveOpenCL()
+cv2.ocl.setUseOpenCL(use_opencl)
+
+# The fused Numba kernel is only used where choose_detect_backend measures it
+# beating OpenCV's separate calls
+use_numba = False
+if use_cuda:
+    cuda_stream = cv2.cuda.Stream()
+
 # Global variables
 camera = None
-output_frame = None
+output_jpeg = None  # Latest annotated frame, JPEG-encoded once and shared by all viewers
 lock = threading.Lock()
+frame_ready = threading.Condition(lock)  # Notified whenever output_jpeg is replaced
+raw_frames = collections.deque(maxlen=2)  # Newest captured frames; the oldest is dropped when full
+raw_frame_ready = threading.Condition()
 motion_detected = False
 last_motion_time = None
-motion_threshold = 5000  # Adjust based on sensitivity needs
+motion_threshold = 5000  # Adjust based on sensitivity needs (in full-resolution pixels)
+pixel_threshold = 25  # Minimum grayscale difference for a pixel to count as moving
+detection_scale = 0.5  # Motion detection runs on a downscaled copy of each frame
 frame_count = 0
 
 # Settings (would be stored in a database in production)
@@ -57,8 +98,20 @@ settings = {
     }
 }
 
-# Store motion events
-motion_events = []
+# Notification clients, created on first use and reused across alerts
+smtp_connection = None
+smtp_lock = threading.Lock()
+smtp_generation = 0  # Bumped when settings change so alert threads drop the old connection
+smtp_connection_generation = 0
+twilio_client = None
+twilio_lock = threading.Lock()
+
+# Work buffers reused across frames by the detection pipeline
+detect_buffers = {}
+
+# Store the last 20 motion events, newest first
+motion_events = collections.deque(maxlen=20)
+motion_events_json = '[]'  # Serialized once per new event for /api/motion_events
 
 
 def allowed_file(filename):
@@ -66,30 +119,226 @@ def allowed_file(filename):
            filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
-def detect_motion(frame1, frame2):
-    # Convert frames to grayscale
-    gray1 = cv2.cvtColor(frame1, cv2.COLOR_BGR2GRAY)
-    gray2 = cv2.cvtColor(frame2, cv2.COLOR_BGR2GRAY)
+if njit is not None and not use_cuda:
+    @njit(parallel=True, fastmath=True, cache=True)
+    def count_motion_bgr(prev_gray, bgr, mask, thr):
+        # Fused BGR->gray + absdiff + threshold + count in a single pass. The new
+        # grayscale frame is written back into prev_gray for the next call.
+        height, width = prev_gray.shape
+        count = 0
+        for i in prange(height):
+            gray = prev_gray[i]
+            pixels = bgr[i].reshape(-1)
+            out = mask[i]
+            row_count = 0
+            for j in range(width):
+                # Fixed-point luma (29*B + 150*G + 77*R) / 256
+                b = np.int32(pixels[3 * j])
+                g = np.int32(pixels[3 * j + 1])
+                r = np.int32(pixels[3 * j + 2])
+                y = (29 * b + 150 * g + 77 * r) >> 8
+                p = np.int32(gray[j])
+                
+                # Branchless |y - p| > thr, so the whole loop body stays in vector lanes
+                hit = np.int32(max(y, p) - min(y, p) > thr)
+                out[j] = 255 * hit
+                row_count += hit
+                gray[j] = y
+            count += row_count
+        return count
+
+    # Compile now so the first camera frame doesn't pay the JIT cost
+    count_motion_bgr(np.zeros((64, 64), np.uint8), np.zeros((64, 64, 3), np.uint8),
+                     np.zeros((64, 64), np.uint8), pixel_threshold)
+
+def get_buffer(name, shape):
+    # Reuse the same array every frame instead of allocating a new one
+    buf = detect_buffers.get(name)
+    if buf is None or buf.shape != shape:
+        buf = detect_buffers[name] = np.empty(shape, np.uint8)
+    return buf
+
+
+def upload_frame(frame):
+    # Upload straight from the captured frame; callers wait on the stream before
+    # letting go of it, so no staging copy is needed
+    gpu_frame = detect_buffers.setdefault('gpu_frame', cv2.cuda_GpuMat())
+    gpu_frame.upload(frame, cuda_stream)
+    return gpu_frame
+
+
+def downscale(frame):
+    # Shrink the frame so the detection pipeline touches fewer pixels
+    height, width = frame.shape[:2]
+    size = (round(width * detection_scale), round(height * detection_scale))
     
-    # Compute the absolute difference between frames
-    frame_diff = cv2.absdiff(gray1, gray2)
+    # Upload to the GPU or OpenCL device if available; the ops below then run there
+    if use_cuda:
+        return cv2.cuda.resize(upload_frame(frame), size, interpolation=cv2.INTER_AREA, stream=cuda_stream)
+    if use_opencl:
+        return cv2.resize(cv2.UMat(frame), size, interpolation=cv2.INTER_AREA)
+    return cv2.resize(frame, size, dst=get_buffer('small', (size[1], size[0], 3)), interpolation=cv2.INTER_AREA)
+
+
+def to_gray(frame):
+    small = downscale(frame)
+    if use_cuda:
+        return cv2.cuda.cvtColor(small, cv2.COLOR_BGR2GRAY, stream=cuda_stream)
+    if use_numba:
+        # Use the same fixed-point conversion as count_motion_bgr
+        gray = np.zeros(small.shape[:2], np.uint8)
+        count_motion_bgr(gray, small, np.empty_like(gray), pixel_threshold)
+        return gray
+    return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+
+def motion_roi(thresh):
+    # Crop the mask to the bounding box of moving pixels, padded by the dilation
+    # reach so blobs on the edge of the box aren't clipped. Returns the box origin
+    # and the cropped 0/255 host mask.
+    pad = DILATE_KERNEL.shape[0] // 2
     
-    # Apply threshold to highlight differences
-    thresh = cv2.threshold(frame_diff, 25, 255, cv2.THRESH_BINARY)[1]
+    if use_cuda:
+        thresh = thresh.download()
+    elif use_opencl:
+        thresh = thresh.get()
     
-    # Dilate the thresholded image to fill in holes
-    thresh = cv2.dilate(thresh, None, iterations=2)
+    # boundingRect on a single-channel mask boxes its nonzero pixels
+    x, y, w, h = cv2.boundingRect(thresh)
+    height, width = thresh.shape
+    x0, y0 = max(x - pad, 0), max(y - pad, 0)
+    x1, y1 = min(x + w + pad, width), min(y + h + pad, height)
+    return x0, y0, thresh[y0:y1, x0:x1]
+
+
+def detect_motion(prev_gray, frame):
+    # Count moving pixels directly instead of summing contour areas
+    if use_cuda:
+        # Convert, diff and threshold on the GPU, queued on a single stream
+        gray = to_gray(frame)
+        frame_diff = cv2.cuda.absdiff(prev_gray, gray, stream=cuda_stream)
+        _, thresh = cv2.cuda.threshold(frame_diff, pixel_threshold, 255, cv2.THRESH_BINARY, stream=cuda_stream)
+        cuda_stream.waitForCompletion()
+        motion_area = cv2.cuda.countNonZero(thresh)
+    elif use_numba:
+        # Convert, diff and threshold in one pass; prev_gray is updated in place
+        thresh = get_buffer('mask', prev_gray.shape)
+        motion_area = count_motion_bgr(prev_gray, downscale(frame), thresh, pixel_threshold)
+        gray = prev_gray
+    else:
+        # Convert only the current (downscaled) frame; the previous grayscale is cached by the caller
+        gray = to_gray(frame)
+        
+        # Compute the absolute difference between frames and highlight moving pixels
+        if use_opencl:
+            frame_diff = cv2.absdiff(prev_gray, gray)
+            thresh = cv2.threshold(frame_diff, pixel_threshold, 255, cv2.THRESH_BINARY)[1]
+        else:
+            # Threshold in place so the diff and mask share one cache-resident buffer
+            frame_diff = cv2.absdiff(prev_gray, gray, dst=get_buffer('mask', gray.shape))
+            thresh = cv2.threshold(frame_diff, pixel_threshold, 255, cv2.THRESH_BINARY, dst=frame_diff)[1]
+        motion_area = cv2.countNonZero(thresh)
     
-    # Find contours on thresholded image
-    contours, _ = cv2.findContours(thresh.copy(), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    # The threshold is expressed in full-resolution pixels, so scale it by the area ratio
+    motion = motion_area > motion_threshold * detection_scale ** 2
     
-    # Calculate total area of all contours
-    total_area = sum([cv2.contourArea(c) for c in contours])
+    # Only trace contours when there is motion to draw
+    contours = []
+    if motion:
+        # Trace contours only inside the region that actually moved
+        x, y, roi = motion_roi(thresh)
+        
+        # Dilate the thresholded image to merge nearby blobs into single contours
+        roi = cv2.dilate(roi, DILATE_KERNEL)
+        contours, _ = cv2.findContours(roi, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(x, y))
+        
+        # Map contour points back to full-resolution coordinates for drawing
+        contours = [(c / detection_scale).astype(np.int32) for c in contours]
+    
+    return motion, thresh, contours, gray
+
+
+def choose_detect_backend(frame):
+    global use_numba, use_opencl
+    
+    if use_cuda or njit is None:
+        return
     
-    return total_area > motion_threshold, thresh, contours
+    # Time both CPU paths on a real frame and keep the faster one
+    opencl = use_opencl
+    timings = []
+    for numba in (False, True):
+        use_numba, use_opencl = numba, opencl and not numba
+        prev_gray = to_gray(frame)
+        detect_motion(prev_gray, frame)
+        start = time.perf_counter()
+        for _ in range(20):
+            detect_motion(prev_gray, frame)
+        timings.append(time.perf_counter() - start)
+    
+    use_numba = timings[1] < timings[0]
+    use_opencl = opencl and not use_numba
+    print(f"Motion detection backend: {'Numba' if use_numba else 'OpenCV'}")
 
 
-def send_email_alert(image_path):
+def get_smtp_connection():
+    global smtp_connection, smtp_connection_generation
+    
+    # Drop a connection opened with settings that have since changed
+    generation = smtp_generation
+    if smtp_connection is not None and smtp_connection_generation != generation:
+        close_smtp_connection()
+    
+    # Reuse the open connection if the server still answers
+    if smtp_connection is not None:
+        try:
+            if smtp_connection.noop()[0] == 250:
+                return smtp_connection
+        except (smtplib.SMTPException, OSError):
+            pass
+        close_smtp_connection()
+    
+    # Connect to server and log in
+    server = smtplib.SMTP(settings['email']['smtp_server'], settings['email']['smtp_port'], timeout=SMTP_TIMEOUT)
+    server.starttls()
+    server.login(settings['email']['username'], settings['email']['password'])
+    smtp_connection = server
+    smtp_connection_generation = generation
+    return server
+
+
+def close_smtp_connection():
+    global smtp_connection
+    
+    if smtp_connection is not None:
+        try:
+            smtp_connection.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp_connection.close()
+        smtp_connection = None
+
+
+def get_twilio_client():
+    global twilio_client
+    
+    # Build the client once so its HTTP session (and TLS connection) is kept alive
+    with twilio_lock:
+        if twilio_client is None:
+            twilio_client = Client(settings['twilio']['account_sid'], settings['twilio']['auth_token'])
+        return twilio_client
+
+
+def reset_notification_clients():
+    global smtp_generation, twilio_client
+    
+    # Credentials may have changed; reconnect on the next alert. The SMTP connection
+    # may be in use by an alert thread, so just mark it stale rather than waiting on it
+    smtp_generation += 1
+    with twilio_lock:
+        twilio_client = None
+
+
+def send_email_alert(jpeg_bytes, filename):
     if not settings['email']['enabled']:
         return False
     
@@ -102,18 +351,17 @@ def send_email_alert(image_path):
         body = f"Motion was detected at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}."
         msg.attach(MIMEText(body, 'plain'))
         
-        # Attach image
-        with open(image_path, 'rb') as f:
-            img_data = f.read()
-            image = MIMEImage(img_data, name=os.path.basename(image_path))
-            msg.attach(image)
+        # Attach the already-encoded snapshot
+        image = MIMEImage(jpeg_bytes, name=filename)
+        msg.attach(image)
         
-        # Connect to server and send email
-        server = smtplib.SMTP(settings['email']['smtp_server'], settings['email']['smtp_port'])
-        server.starttls()
-        server.login(settings['email']['username'], settings['email']['password'])
-        server.send_message(msg)
-        server.quit()
+        # Send over the persistent connection; alerts share it one at a time
+        with smtp_lock:
+            try:
+                get_smtp_connection().send_message(msg)
+            except Exception:
+                close_smtp_connection()
+                raise
         return True
     except Exception as e:
         print(f"Email error: {e}")
@@ -125,7 +373,7 @@ def send_sms_alert(image_url):
         return False
     
     try:
-        client = Client(settings['twilio']['account_sid'], settings['twilio']['auth_token'])
+        client = get_twilio_client()
         message = client.messages.create(
             body=f"Motion detected at {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}. View image: {image_url}",
             from_=settings['twilio']['from_number'],
@@ -137,120 +385,199 @@ def send_sms_alert(image_url):
         return False
 
 
+def open_camera():
+    # Use V4L2 directly on Linux for its memory-mapped capture buffers
+    if platform.system() == 'Linux':
+        cam = cv2.VideoCapture(0, cv2.CAP_V4L2)
+    else:
+        cam = cv2.VideoCapture(0)  # Use 0 for webcam
+    
+    # Ask for compressed MJPG frames so USB transfer is cheap and decoding can be skipped
+    cam.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+    
+    # Keep the driver queue short so we never process stale frames
+    cam.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cam
+
+
+def grab_frames():
+    global frame_count
+    
+    # Capture thread: only pulls frames off the camera so capture overlaps detection
+    while camera.grab():
+        # Process every other frame to reduce CPU usage; skipped frames are never decoded
+        skip = frame_count % 2 != 0
+        frame_count += 1
+        if skip:
+            continue
+        
+        success, frame = camera.retrieve()
+        if not success:
+            break
+        with raw_frame_ready:
+            raw_frames.append(frame)
+            raw_frame_ready.notify()
+    
+    # Tell the detection loop the camera has stopped
+    with raw_frame_ready:
+        raw_frames.append(None)
+        raw_frame_ready.notify()
+
+
+def next_frame():
+    # Block until the capture thread has a frame; None means the camera stopped
+    with raw_frame_ready:
+        raw_frame_ready.wait_for(lambda: raw_frames)
+        return raw_frames.popleft()
+
+
 def generate_frames():
-    global camera, output_frame, lock, motion_detected, last_motion_time, frame_count, motion_events
+    global camera, motion_detected, last_motion_time, motion_events_json
     
     # Initialize camera
     if camera is None:
         try:
-            camera = cv2.VideoCapture(0)  # Use 0 for webcam
+            camera = open_camera()
             if not camera.isOpened():
                 print("Error: Could not open camera.")
                 # Create a blank frame with error message for display
                 blank_frame = np.zeros((480, 640, 3), np.uint8)
                 cv2.putText(blank_frame, "Camera not available", (100, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-                with lock:
-                    output_frame = blank_frame.copy()
+                publish_frame(blank_frame)
                 return
         except Exception as e:
             print(f"Camera error: {e}")
             # Create a blank frame with error message for display
             blank_frame = np.zeros((480, 640, 3), np.uint8)
             cv2.putText(blank_frame, "Camera not available", (100, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-            with lock:
-                output_frame = blank_frame.copy()
+            publish_frame(blank_frame)
             return
     
-    # Initialize previous frame
-    _, prev_frame = camera.read()
+    # Start the capture thread
+    t = threading.Thread(target=grab_frames)
+    t.daemon = True
+    t.start()
+    
+    # Initialize previous grayscale frame
+    prev_frame = next_frame()
+    if prev_frame is None:
+        return
+    choose_detect_backend(prev_frame)
+    prev_gray = to_gray(prev_frame)
+    if use_cuda:
+        # Let the first upload finish before anything else touches the stream's inputs
+        cuda_stream.waitForCompletion()
+    
+    # Spacing for the static-scene gate. The thinnest change that can reach
+    # motion_threshold is a band running across the whole frame; downscaling blends
+    # its edges into neighbouring pixels, so the detector can see it up to one
+    # downscaled pixel wider on each side. Sampling at least that finely means any
+    # band the detector can trigger on covers a sampled row or column
+    block = round(1 / detection_scale)
+    sample_step = max(1, int(motion_threshold / max(prev_frame.shape[:2])) - 2 * (block - 1))
+    height, width = prev_frame.shape[:2]
+    sample_size = (-(-width // sample_step), -(-height // sample_step))
+    # Nearest-neighbour resize picks one pixel per step without an extra copy
+    prev_sample = cv2.resize(prev_frame, sample_size, interpolation=cv2.INTER_NEAREST)
     
     while True:
-        success, frame = camera.read()
-        if not success:
+        frame = next_frame()
+        if frame is None:
             break
         
-        # Process every other frame to reduce CPU usage
-        if frame_count % 2 == 0:
-            # Detect motion
-            motion, thresh, contours = detect_motion(prev_frame, frame)
-            
-            # Update previous frame
-            prev_frame = frame.copy()
-            
-            # Draw contours on frame
-            frame_with_contours = frame.copy()
-            cv2.drawContours(frame_with_contours, contours, -1, (0, 255, 0), 2)
-            
-            # Add timestamp
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            cv2.putText(frame_with_contours, timestamp, (10, frame.shape[0] - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-            
-            # Handle motion detection
-            current_time = time.time()
-            if motion:
-                # Only trigger a new alert if it's been more than 5 seconds since the last one
-                if last_motion_time is None or (current_time - last_motion_time) > 5:
-                    motion_detected = True
-                    last_motion_time = current_time
-                    
-                    # Save the frame
-                    filename = f"motion_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
-                    filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-                    cv2.imwrite(filepath, frame)
-                    
-                    # Add to motion events
-                    motion_events.insert(0, {
-                        'timestamp': timestamp,
-                        'image': filename,
-                        'path': filepath
-                    })
-                    
-                    # Keep only the last 20 events
-                    if len(motion_events) > 20:
-                        motion_events = motion_events[:20]
-                    
-                    # Send alerts
-                    threading.Thread(target=send_email_alert, args=(filepath,)).start()
-                    # In a real app, you'd have a proper URL
-                    threading.Thread(target=send_sms_alert, args=(f"http://yourdomain.com/static/captures/{filename}",)).start()
-            
-            # Update the output frame with contours
-            with lock:
-                output_frame = frame_with_contours.copy()
+        # Skip the whole pipeline (and keep the last published JPEG) when no sampled
+        # pixel changed by more than pixel_threshold in any channel. Grayscale is a
+        # weighted average of the channels, so the detector can't see motion there either
+        sample = cv2.resize(frame, sample_size, interpolation=cv2.INTER_NEAREST)
+        if cv2.norm(sample, prev_sample, cv2.NORM_INF) <= pixel_threshold:
+            continue
+        prev_sample = sample
         
-        frame_count += 1
+        # Detect motion
+        motion, thresh, contours, gray = detect_motion(prev_gray, frame)
+        
+        # Update previous grayscale frame
+        prev_gray = gray
+        
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        # Artificial delay to reduce CPU usage
-        time.sleep(0.01)
+        # Handle motion detection
+        current_time = time.time()
+        # Only trigger a new alert if it's been more than 5 seconds since the last one
+        if motion and (last_motion_time is None or (current_time - last_motion_time) > 5):
+            # Encode the clean snapshot once for both disk and email
+            (flag, encoded_image) = cv2.imencode(".jpg", frame)
+            if not flag:
+                print("Error: Could not encode motion snapshot.")
+            else:
+                motion_detected = True
+                last_motion_time = current_time
+                
+                # Save the frame
+                filename = f"motion_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.jpg"
+                filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+                jpeg_bytes = encoded_image.tobytes()
+                with open(filepath, 'wb') as f:
+                    f.write(jpeg_bytes)
+                
+                # Add to motion events
+                motion_events.appendleft({
+                    'timestamp': timestamp,
+                    'image': filename,
+                    'path': filepath
+                })
+                motion_events_json = json.dumps(list(motion_events))
+                
+                # Send alerts
+                threading.Thread(target=send_email_alert, args=(jpeg_bytes, filename)).start()
+                # In a real app, you'd have a proper URL
+                threading.Thread(target=send_sms_alert, args=(f"http://yourdomain.com/static/captures/{filename}",)).start()
+        
+        # Draw contours and timestamp directly on the frame, after any clean copy was saved
+        cv2.drawContours(frame, contours, -1, (0, 255, 0), 2)
+        cv2.putText(frame, timestamp, (10, frame.shape[0] - 10),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+        
+        # Update the output frame
+        publish_frame(frame)
 
 
-def generate_video_feed():
-    global output_frame, lock
+def publish_frame(frame):
+    global output_jpeg
     
+    # Encode once here so every connected viewer shares the same JPEG bytes
+    (flag, encoded_image) = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, 80])
+    if not flag:
+        return
+    
+    with frame_ready:
+        output_jpeg = encoded_image.tobytes()
+        frame_ready.notify_all()
+
+
+def generate_video_feed():
+    jpeg = None
     while True:
-        with lock:
-            if output_frame is None:
-                continue
-            
-            # Encode the frame as JPEG
-            (flag, encoded_image) = cv2.imencode(".jpg", output_frame)
-            if not flag:
-                continue
+        # Sleep until a frame this viewer hasn't sent yet is published
+        with frame_ready:
+            frame_ready.wait_for(lambda: output_jpeg is not None and output_jpeg is not jpeg, timeout=1.0)
+            jpeg = output_jpeg
+        if jpeg is None:
+            continue
         
         # Yield the output frame in byte format
         yield(b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + 
-              bytearray(encoded_image) + b'\r\n')
+              jpeg + b'\r\n')
 
 
 @app.route('/')
 def index():
-    return render_template('index.html', settings=settings, motion_events=motion_events)
+    return render_template('index.html', settings=settings, motion_events=list(motion_events))
 
 
 @app.route('/dashboard')
 def dashboard():
-    return render_template('dashboard.html', motion_events=motion_events)
+    return render_template('dashboard.html', motion_events=list(motion_events))
 
 
 @app.route('/settings')
@@ -269,13 +596,7 @@ def video_feed():
 
 @app.route('/api/motion_events')
 def get_motion_events():
-    try:
-        # Add a small delay to prevent overwhelming the server with requests
-        time.sleep(0.1)
-        return jsonify(motion_events)
-    except Exception as e:
-        app.logger.error(f"Error in get_motion_events: {str(e)}")
-        return jsonify({'error': str(e)}), 500
+    return Response(motion_events_json, mimetype='application/json')
 
 
 @app.route('/api/update_settings', methods=['POST'])
@@ -299,6 +620,8 @@ def update_settings():
     settings['twilio']['from_number'] = request.form.get('twilio_from_number', '')
     settings['twilio']['to_number'] = request.form.get('twilio_to_number', '')
     
+    reset_notification_clients()
+    
     flash('Settings updated successfully!', 'success')
     return redirect(url_for('settings_page'))
 